@@ -4,7 +4,7 @@
 # author:  nbehrnd@yahoo.com
 # license: GPL v2, 2022, 2023
 # date:    <2022-04-22 Fri>
-# edit:    <2023-05-27 Sat>
+# edit:    <2026-10-15 Thu>
 """Provide a sort on DataWarrior clusters by popularity of the cluster.
 
 DataWarrior can recognize structure similarity in a set of molecules.  The
@@ -20,14 +20,15 @@ The script uses only functions of Python's standard library as checked with
 Python in version 3.11.2."""
 
 import argparse
-import csv
+import mmap
 import os
-import re
 import sys
+from collections import Counter
+from operator import itemgetter
 
 
-def get_args():
-    """Get the arguments from the command line."""
+def get_args(arg_list=None):
+    """Get the arguments from the command line, or from arg_list."""
     parser = argparse.ArgumentParser(
         description="""Sort DataWarrior's cluster list based on the number of
         molecules per cluster.  The triage by frequency reports the cluster
@@ -40,7 +41,7 @@ def get_args():
     parser.add_argument(
         "file",
         metavar="file",
-        type=argparse.FileType("rt"),
+        type=argparse.FileType("rb"),
         help="DataWarrior's cluster list which was exported as .txt file",
     )
 
@@ -52,116 +53,131 @@ def get_args():
         populous cluster the lowest label""",
     )
 
-    return parser.parse_args()
+    return parser.parse_args(arg_list)
 
 
 def file_reader(input_file=""):
     """access the data as provided by DataWarrior's .txt file
 
-    Assuming DW's file is less than half of the (remaining) available
-    RAM of the computer used, the whole content of input file is read."""
-    raw_table = input_file.read().splitlines()
-
-    head_line = raw_table[0]
-    table_body = raw_table[1:]
-
-    return head_line, table_body
-
-
-def access_raw_data(input_file=""):
-    """Access DW's exported cluster list."""
-    raw_data = []
-
+    Tabulators, line breaks and cluster labels are ASCII, hence only the
+    header is decoded while the lines of the table body are kept as bytes.
+    If possible, the file is memory mapped and read line by line, which
+    spares a copy of the whole content in RAM.  Otherwise (e.g., data piped
+    by stdin), the header is read first, and then the remaining content at
+    once.  Either way, the lines of the table body are materialized only
+    once because they are visited twice (count, and relabel).  Blank lines
+    (e.g., trailing ones) are skipped."""
     try:
-        with open(input_file, encoding="utf-8", mode="rt") as source:
-            raw_data = source.readlines()
-    except OSError:
-        print(f"Input file {input_file} was not accessible.  Exit.")
-        sys.exit()
+        buffer = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        head_line = input_file.readline()
+        table_body = [line for line in input_file.read().splitlines() if line]
+    else:
+        with buffer:
+            head_line = buffer.readline()
+            table_body = [
+                stripped for line in iter(buffer.readline, b"")
+                if (stripped := line.rstrip(b"\r\n"))
+            ]
 
-    table_body_2 = raw_data[1:]
-    return table_body_2
+    return head_line.rstrip(b"\r\n").decode("utf-8"), table_body
 
 
 def identify_cluster_column(table_header):
     """Identify the column with DW's assigned cluster labels.
 
-    The first occurrence of 'Cluster No' identified by a regular expression is
-    assumed to indicate the column of interest.  For this, the split has to be
-    an explicit separator (tabulator)."""
+    The first column header containing 'Cluster No' is assumed to indicate
+    the column of interest.  For this, the split has to be an explicit
+    separator (tabulator)."""
     column_heads = table_header.split("\t")
-    list_of_matches = [
-        i for i, item in enumerate(column_heads)
-        if re.search("Cluster No", item)
-    ]
-    column_number = int(list_of_matches[0])
+    column_number = next(
+        (i for i, item in enumerate(column_heads) if "Cluster No" in item),
+        None)
+    if column_number is None:
+        print("No column 'Cluster No' was found.  Exit.")
+        sys.exit()
 
     return column_number
 
 
 def read_dw_list(raw_data, cluster_label):
-    """Establish a frequency list based on DW's exported cluster list."""
-    dw_cluster_labels = []
+    """Establish a frequency list based on DW's exported cluster list.
 
-    source = csv.reader(raw_data, delimiter="\t")
-    for row in source:
-        cluster_label_on_molecule = row[cluster_label]
-        dw_cluster_labels.append(cluster_label_on_molecule)
+    Any iterable of the table's lines (bytes, without line terminators) will
+    do.  The cluster labels are counted as bytes, as cut out of the lines."""
+    labels = (
+        line.split(b"\t", cluster_label + 1)[cluster_label]
+        for line in raw_data
+    )
+    count = Counter(labels)
 
-    # build and report a dictionary:
-    count = {}
-    for label in dw_cluster_labels:
-        count.setdefault(label, 0)
-        count[label] = count[label] + 1
+    return count
 
-    #    print("\nDataWarrior's assignment of clusters:")
-    for key, value in count.items():
-        print(f"cluster: {key:>8} molecules: {value:>8}")
 
-    return count
+def report_clusters(count):
+    """Report the number of molecules per cluster to the CLI."""
+    report = "".join(
+        f"cluster: {key:>8} molecules: {value:>8}\n"
+        for key, value in count.items())
+    sys.stdout.write(report)
 
 
 def entry_sorter(count=None, reversed_order=None):
-    """Sort the popularity of the clusters either way."""
-    #     print(f"status reversed_order: {reversed_order}")
+    """Sort the popularity of the clusters either way.
+
+    For clusters of equal population, the sequence of their first appearance
+    in the table is retained."""
     if reversed_order:
-        sorted_list = sorted(count, key=count.__getitem__, reverse=True)
+        sorted_list = [label for label, _ in count.most_common()]
     else:
-        sorted_list = sorted(count, key=count.__getitem__, reverse=False)
+        sorted_list = [
+            label for label, _ in sorted(count.items(), key=itemgetter(1))
+        ]
     return sorted_list
 
 
 def scrutin_by_label(table_body, population_list, old_cluster_label):
-    """Update the molecules' labels according to the cluster popularity."""
-    reporter_list = []
-    new_cluster_label = 1
-
-    for entry in population_list:
-        source = csv.reader(table_body, delimiter="\t")
-
-        for row in source:
-            if row[old_cluster_label] == entry:
-                cell_entries = row
-                del cell_entries[old_cluster_label]
-                cell_entries.insert(old_cluster_label, str(new_cluster_label))
-                retain = "\t".join(cell_entries)
-                reporter_list.append(retain)
-
-        new_cluster_label += 1
-
-    return reporter_list
+    """Update the molecules' labels according to the cluster popularity.
+
+    A single pass over the table sorts the molecules into one bucket per
+    cluster, and relabels them on the fly.  The buckets are returned in the
+    sequence of the population list (rather than one flat list) to be
+    written one after the other."""
+    list_of_lists = [[] for _ in population_list]
+    # one lookup per molecule yields both the new label, and the bucket
+    relabel = {
+        label: (str(i).encode(), bucket.append)
+        for i, (label, bucket) in enumerate(
+            zip(population_list, list_of_lists), start=1)
+    }
+    join = b"\t".join
+    max_split = old_cluster_label + 1
+
+    for row in table_body:
+        # columns right of the cluster label stay joined as one string
+        cell_entries = row.split(b"\t", max_split)
+        new_label, add_to_bucket = relabel[cell_entries[old_cluster_label]]
+        cell_entries[old_cluster_label] = new_label
+        add_to_bucket(join(cell_entries))
+
+    return list_of_lists
 
 
 def permanent_report(input_file="", topline="", listing=None):
-    """Provide a permanent record DW may access."""
+    """Provide a permanent record DW may access.
+
+    The listing holds the molecules cluster by cluster.  Each cluster is
+    joined and written on its own, so the record never is assembled as a
+    whole in RAM."""
     stem_input_file = os.path.splitext(input_file)[0]
     report_file = "".join([stem_input_file, str("_sort.txt")])
 
     try:
-        with open(report_file, encoding="utf-8", mode="w") as newfile:
-            newfile.write("".join([topline, "\n"]))
-            for entry in listing:
-                newfile.write("".join([entry, "\n"]))
+        with open(report_file, mode="wb") as newfile:
+            newfile.write(topline.encode("utf-8") + b"\n")
+            for cluster in listing:
+                newfile.write(b"\n".join(cluster))
+                newfile.write(b"\n")
     except OSError:
         print(f"Error to export record into {report_file}.  Exit.")
         sys.exit()
@@ -169,9 +185,12 @@ def permanent_report(input_file="", topline="", listing=None):
     return report_file
 
 
-def main():
-    """Join the functions."""
-    args = get_args()
+def main(arg_list=None):
+    """Join the functions.
+
+    Passing the arguments as arg_list allows to run the script from within
+    Python, e.g. main(["example.txt", "-r"])."""
+    args = get_args(arg_list)
 
     # read the old data:
     head_line, table_body = file_reader(args.file)
@@ -180,18 +199,26 @@ def main():
 
     print("\nDataWarrior's assignment of clusters:")
     popularity = read_dw_list(table_body, cluster_label)
+    report_clusters({
+        label.decode("utf-8"): molecules
+        for label, molecules in popularity.items()
+    })
 
     # reorganize the data:
     sorted_population_list = entry_sorter(popularity, args.reverse)
     #    print(sorted_population_list)
     report_list = scrutin_by_label(table_body, sorted_population_list,
                                    cluster_label)
-    report_file = permanent_report(args.file.name, head_line, report_list)
+    del table_body  # release the old rows before the record is written
+    permanent_report(args.file.name, head_line, report_list)
 
-    # read the new data:
+    # report the new labels, known without reading the new record again:
     print("\nclusters newly sorted and labeled:")
-    raw_data_2 = access_raw_data(report_file)
-    read_dw_list(raw_data_2, cluster_label)
+    new_popularity = {
+        new_label: popularity[old_label]
+        for new_label, old_label in enumerate(sorted_population_list, start=1)
+    }
+    report_clusters(new_popularity)
 
 
 if __name__ == "__main__":